@@ -0,0 +1,168 @@
+import asyncio
+import os
+import subprocess
+import sys
+from typing import Optional
+
+import typer
+
+import server
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Only needed by exports, media storage and password hashing; never at startup
+LAZY_MODULES = {"pandas", "numpy", "pyarrow", "boto3", "botocore", "passlib", "bcrypt"}
+DEFAULT_IMPORT_TIME_BUDGET_MS = 1000
+
+cli = typer.Typer(help="Maintenance commands for the Forex Course backend")
+
+@cli.callback()
+def main():
+    """Run against the database configured by MONGO_URL and DB_NAME."""
+
+def measure_import_time(module: str):
+    """Return (cumulative us, direct imports slowest first, all modules) for importing a module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    
+    return parse_import_time(result.stderr, module)
+
+def parse_import_time(output: str, module: str):
+    """Parse `-X importtime` output into the same tuple as measure_import_time."""
+    imported = set()
+    children = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Two spaces of indentation per nesting level; a module is listed after its own imports
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        imported.add(name)
+        if depth == 1:
+            children.append((int(cumulative), name))
+        elif depth == 0:
+            if name == module:
+                return int(cumulative), sorted(children, reverse=True), imported
+            children = []
+    raise RuntimeError(f"No importtime entry for {module}")
+
+@cli.command("rebuild-sales-rollups")
+def rebuild_sales_rollups_command():
+    """Rebuild the daily and monthly sales rollups from payment_transactions."""
+    asyncio.run(server.rebuild_sales_rollups())
+    typer.echo("Sales rollups rebuilt")
+
+@cli.command("reconcile-sales-rollups")
+def reconcile_sales_rollups_command():
+    """Finish rollup updates left pending by failed or interrupted payment requests."""
+    typer.echo(f"{asyncio.run(server.reconcile_sales_rollups())} pending transactions reconciled")
+
+@cli.command("export")
+def export_command(
+    collection: str = typer.Argument(..., help="users, payment_transactions or bookings"),
+    output: str = typer.Option(..., "--output", "-o", help="File to write"),
+    format: str = typer.Option("csv", help="csv or parquet"),
+    columns: Optional[str] = typer.Option(None, help="Comma-separated columns, all by default"),
+    start: Optional[str] = typer.Option(None, help="First created_at day, YYYY-MM-DD"),
+    end: Optional[str] = typer.Option(None, help="Last created_at day, YYYY-MM-DD")
+):
+    """Stream a collection to CSV or Parquet in bounded batches."""
+    if format not in server.EXPORT_FORMATS:
+        raise typer.BadParameter(f"Invalid export format: {format}")
+    try:
+        selected_columns = server.resolve_export_columns(collection, columns)
+        start_date = server.parse_export_date(start)
+        end_date = server.parse_export_date(end)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    
+    async def write_export():
+        with open(output, "wb") as f:
+            async for chunk in server.export_stream(collection, format, selected_columns, start_date, end_date):
+                f.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+    
+    asyncio.run(write_export())
+    typer.echo(f"Exported {collection} to {output}")
+
+@cli.command("import-content")
+def import_content_command(
+    archive: str = typer.Argument(..., help="Zip archive with the lesson files"),
+    manifest: Optional[str] = typer.Option(None, help="JSON manifest, manifest.json inside the archive by default"),
+    uploaded_by: str = typer.Option("cli", help="Recorded as uploaded_by on the content")
+):
+    """Import every lesson listed in the manifest in one job."""
+    manifest_content = None
+    if manifest:
+        with open(manifest, "rb") as f:
+            manifest_content = f.read()
+    try:
+        items = server.read_import_manifest(archive, manifest_content)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    
+    async def run_import():
+        job = await server.create_import_job(items, uploaded_by)
+        await server.run_content_import(job["id"], archive, uploaded_by)
+        return await server.db.import_jobs.find_one({"id": job["id"]})
+    
+    job = asyncio.run(run_import())
+    for item in job["items"]:
+        typer.echo(f"{item['status']:>6}  {item['file']}" + (f"  ({item['error']})" if item["error"] else ""))
+    typer.echo(f"{job['processed'] - job['failed']}/{job['total']} imported, job {job['id']}")
+
+@cli.command("check-import-time")
+def check_import_time_command(
+    budget_ms: int = typer.Option(DEFAULT_IMPORT_TIME_BUDGET_MS, envvar="IMPORT_TIME_BUDGET_MS", help="Maximum startup import time"),
+    runs: int = typer.Option(3, help="Measure this many fresh interpreters and keep the fastest"),
+    top: int = typer.Option(10, help="Number of direct imports to report")
+):
+    """Report the server's `python -X importtime` cost and fail above the budget."""
+    total_us, children, imported = min((measure_import_time("server") for _ in range(runs)), key=lambda m: m[0])
+    typer.echo(f"server: {total_us / 1000:.1f} ms (best of {runs}, budget {budget_ms} ms)")
+    for cumulative, name in children[:top]:
+        typer.echo(f"  {cumulative / 1000:8.1f} ms  {name}")
+    
+    problems = []
+    eager = sorted({name.split(".")[0] for name in imported} & LAZY_MODULES)
+    if eager:
+        problems.append(f"Imported at startup but should be lazy: {', '.join(eager)}")
+    if total_us > budget_ms * 1000:
+        problems.append(f"Startup import time {total_us / 1000:.1f} ms exceeds the {budget_ms} ms budget")
+    for problem in problems:
+        typer.echo(problem, err=True)
+    if problems:
+        raise typer.Exit(code=1)
+
+@cli.command("publish-media")
+def publish_media_command(
+    content_id: Optional[str] = typer.Option(None, help="Publish a single content item"),
+    force: bool = typer.Option(False, help="Re-publish items that already have a storage key")
+):
+    """Copy content files into the media store configured by MEDIA_BACKEND."""
+    if server.MEDIA_BACKEND not in ("s3", "nginx"):
+        raise typer.BadParameter("Set MEDIA_BACKEND to 's3' or 'nginx'")
+    
+    query = {}
+    if content_id:
+        query["id"] = content_id
+    if not force:
+        query["storage_key"] = {"$exists": False}
+    
+    async def publish():
+        published = 0
+        async for content in server.db.course_content.find(query):
+            key = await server.publish_content_media(content)
+            typer.echo(f"Published {content['id']} -> {key}")
+            published += 1
+        return published
+    
+    typer.echo(f"{asyncio.run(publish())} content items published to {server.MEDIA_BACKEND}")
+
+if __name__ == "__main__":
+    cli()
@@ -1,24 +1,38 @@
 import os
 import uuid
 import io
+import asyncio
+import csv
+import logging
+import math
+import re
+import shutil
+import tempfile
+import zipfile
+import time
+from urllib.parse import quote
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, BackgroundTasks
+from functools import lru_cache
+from typing import List, Optional, Dict, Set
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Form, BackgroundTasks, Request, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient
+from fastapi.responses import StreamingResponse, RedirectResponse, Response
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 from pydantic import BaseModel, EmailStr
-from passlib.context import CryptContext
 from jose import JWTError, jwt
-import bcrypt
 import base64
 import json
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # MongoDB setup
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DB_NAME", "forex_course_db")
@@ -31,9 +45,21 @@ SECRET_KEY = "your-secret-key-here-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# Media delivery: short-lived signed links let the object store (S3/MinIO) or nginx
+# (X-Accel-Redirect) serve file bytes instead of the API workers
+MEDIA_BACKEND = os.getenv("MEDIA_BACKEND", "")  # "s3", "nginx", or empty to stream through the API
+MEDIA_URL_TTL_SECONDS = int(os.getenv("MEDIA_URL_TTL_SECONDS", "300"))
+MEDIA_CLOCK_SKEW_SECONDS = int(os.getenv("MEDIA_CLOCK_SKEW_SECONDS", "30"))
+S3_BUCKET = os.getenv("S3_BUCKET", "forex-course-media")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # e.g. http://localhost:9000 for MinIO
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "/var/lib/forex-course/media")
+NGINX_MEDIA_PREFIX = os.getenv("NGINX_MEDIA_PREFIX", "/protected-media/")
+# Storage keys are derived from the server-generated content id, never from the uploaded filename
+MEDIA_STORAGE_KEY_PATTERN = re.compile(r"^content/[A-Za-z0-9-]+(\.[a-z0-9]{1,10})?$")
+MEDIA_EXTENSION_PATTERN = re.compile(r"^\.[a-z0-9]{1,10}$")
+
 # App setup
 app = FastAPI(title="Forex Course App", version="1.0.0")
 
@@ -73,6 +99,81 @@ COURSE_PACKAGES: Dict[str, Dict] = {
     }
 }
 
+# Admin booking feed configuration
+BOOKING_STATUSES = ("pending", "confirmed", "cancelled")
+BOOKING_FEED_BUFFER_SIZE = 500
+BOOKING_FEED_HEARTBEAT_SECONDS = 15
+# How long the connection-time probe may wait on the change stream
+BOOKING_FEED_PROBE_MS = 100
+# Only inserts and updates touching the status are pushed to the admin feed
+BOOKING_FEED_PIPELINE = [
+    {"$match": {"$or": [
+        {"operationType": "insert"},
+        {"operationType": "update", "updateDescription.updatedFields.status": {"$exists": True}}
+    ]}}
+]
+# Returned by a standalone mongod, where change streams are not available
+CHANGE_STREAM_UNSUPPORTED_CODES = {40573}
+
+# Sales rollups: transactions are counted under the day/month of their created_at,
+# so status changes only move them between buckets of the same period
+SALES_ROLLUP_GRANULARITIES = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+SALES_DASHBOARD_DEFAULT_DAYS = 30
+# Transactions whose rollup update has been pending this long are finished by reconcile_sales_rollups
+SALES_ROLLUP_RECONCILE_AFTER_SECONDS = 60
+DUPLICATE_KEY_ERROR = 11000
+
+# Bulk export: exportable columns and their types per collection (password hashes are never exported)
+EXPORT_BATCH_SIZE = 5000
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+EXPORT_COLUMNS: Dict[str, Dict[str, str]] = {
+    "users": {
+        "id": "string",
+        "email": "string",
+        "name": "string",
+        "gdpr_consent": "bool",
+        "marketing_consent": "bool",
+        "is_premium": "bool",
+        "is_admin": "bool",
+        "purchased_courses": "list",
+        "created_at": "datetime"
+    },
+    "payment_transactions": {
+        "id": "string",
+        "order_id": "string",
+        "paypal_order_id": "string",
+        "user_email": "string",
+        "course_package": "string",
+        "amount": "float",
+        "currency": "string",
+        "status": "string",
+        "created_at": "datetime",
+        "completed_at": "datetime"
+    },
+    "bookings": {
+        "id": "string",
+        "user_email": "string",
+        "preferred_date": "string",
+        "preferred_time": "string",
+        "notes": "string",
+        "status": "string",
+        "created_at": "datetime",
+        "updated_at": "datetime"
+    }
+}
+
+# Batch content import: archive entries are streamed into GridFS with bounded parallelism
+IMPORT_CONCURRENCY = 4
+IMPORT_CHUNK_SIZE = 1024 * 1024
+IMPORT_MANIFEST_NAME = "manifest.json"
+CONTENT_TYPES_BY_EXTENSION = {
+    ".mp4": "video",
+    ".mov": "video",
+    ".ppt": "powerpoint",
+    ".pptx": "powerpoint",
+    ".pdf": "pdf"
+}
+
 # Pydantic models
 class UserRegistration(BaseModel):
     email: EmailStr
@@ -100,6 +201,9 @@ class BookingRequest(BaseModel):
     preferred_time: str
     notes: Optional[str] = None
 
+class BookingStatusUpdate(BaseModel):
+    status: str
+
 class PaymentRequest(BaseModel):
     course_package: str
     user_email: EmailStr
@@ -117,11 +221,17 @@ class PayPalOrderRequest(BaseModel):
     amount: float
 
 # Utility functions
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib and its bcrypt backend are only needed on register/login, not at startup
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -158,6 +268,747 @@ def serialize_mongodb_doc(doc):
     
     return result
 
+def format_sse_event(event: str, data: dict, event_id: Optional[str] = None) -> str:
+    """Encode one Server-Sent Events message."""
+    message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if event_id:
+        message = f"id: {event_id}\n" + message
+    return message
+
+SSE_HEARTBEAT = ": keep-alive\n\n"
+
+class BookingEventBroker:
+    """In-process pub/sub fallback for standalone mongod, with a bounded replay buffer."""
+
+    def __init__(self, buffer_size: int = BOOKING_FEED_BUFFER_SIZE):
+        # Ids carry a per-process epoch so ids from before a restart are never mistaken for new ones
+        self.epoch = uuid.uuid4().hex[:8]
+        self.sequence = 0
+        self.buffer = deque(maxlen=buffer_size)
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def last_event_id(self) -> str:
+        return f"{self.epoch}-{self.sequence}"
+
+    def publish(self, event_type: str, booking: dict):
+        self.sequence += 1
+        # insert_one appends _id after our own "id"; keep the booking id the list endpoint reports
+        booking = {key: value for key, value in booking.items() if key != "_id"}
+        event = (self.sequence, {"type": event_type, "booking": serialize_mongodb_doc(booking)})
+        self.buffer.append(event)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow consumer: drop it, it will reconnect and resume from the buffer
+                self.subscribers.discard(queue)
+
+    def subscribe(self, last_event_id: Optional[str]):
+        """Register a subscriber and return (queue, missed events, or None if the client must reload)."""
+        queue = asyncio.Queue(maxsize=self.buffer.maxlen)
+        self.subscribers.add(queue)
+
+        epoch, _, sequence = (last_event_id or "").partition("-")
+        if epoch != self.epoch or not sequence.isdigit() or int(sequence) > self.sequence:
+            return queue, None
+
+        last_sequence = int(sequence)
+        missed = [event for event in self.buffer if event[0] > last_sequence]
+        if last_sequence < self.sequence and (not missed or missed[0][0] != last_sequence + 1):
+            return queue, None
+        return queue, missed
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def format(self, event) -> str:
+        sequence, data = event
+        return format_sse_event("booking", data, f"{self.epoch}-{sequence}")
+
+booking_events = BookingEventBroker()
+# None until the first feed connection finds out whether the deployment supports change streams
+change_streams_supported: Optional[bool] = None
+
+def watch_bookings(resume_after: Optional[dict], max_await_time_ms: int):
+    return db.bookings.watch(
+        BOOKING_FEED_PIPELINE,
+        full_document="updateLookup",
+        resume_after=resume_after,
+        max_await_time_ms=max_await_time_ms
+    )
+
+async def open_booking_change_stream(resume_token: Optional[str]):
+    """Probe change stream support; return (resume_after, resumed) or None when unsupported."""
+    global change_streams_supported
+    if change_streams_supported is False:
+        return None
+
+    resume_after = {"_data": resume_token} if resume_token else None
+    while True:
+        probe = watch_bookings(resume_after, BOOKING_FEED_PROBE_MS)
+        try:
+            await probe.try_next()
+            probe_token = probe.resume_token
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                change_streams_supported = False
+                return None
+            if resume_after is None:
+                raise
+            resume_after = None
+            continue
+        finally:
+            await probe.close()
+        break
+
+    change_streams_supported = True
+    if resume_after is not None:
+        return resume_after, True
+    # Fresh feed: start where the probe stopped, which is also the id of the "reset" event
+    return probe_token, False
+
+async def change_stream_booking_events(request: Request, resume_after: Optional[dict], resumed: bool):
+    if resumed:
+        yield SSE_HEARTBEAT
+    else:
+        yield format_sse_event("reset", {}, resume_after["_data"] if resume_after else None)
+
+    stream = watch_bookings(resume_after, BOOKING_FEED_HEARTBEAT_SECONDS * 1000)
+    try:
+        while not await request.is_disconnected():
+            change = await stream.try_next()
+            if change is None:
+                yield SSE_HEARTBEAT
+            elif change.get("fullDocument"):
+                event_type = "insert" if change["operationType"] == "insert" else "status"
+                data = {"type": event_type, "booking": serialize_mongodb_doc(change["fullDocument"])}
+                yield format_sse_event("booking", data, change["_id"]["_data"])
+    finally:
+        await stream.close()
+
+async def local_booking_events(request: Request, last_event_id: Optional[str]):
+    queue, missed = booking_events.subscribe(last_event_id)
+    try:
+        if missed is None:
+            yield format_sse_event("reset", {}, booking_events.last_event_id)
+            missed = []
+        for event in missed:
+            yield booking_events.format(event)
+
+        while not await request.is_disconnected():
+            if queue.empty() and queue not in booking_events.subscribers:
+                # Dropped for falling behind: end the stream so the client reconnects
+                break
+            try:
+                event = await asyncio.wait_for(queue.get(), BOOKING_FEED_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield SSE_HEARTBEAT
+                continue
+            yield booking_events.format(event)
+    finally:
+        booking_events.unsubscribe(queue)
+
+def sales_rollup_id(granularity: str, period: str, course_package: str, status: str) -> str:
+    return f"{granularity}|{period}|{course_package}|{status}"
+
+async def record_sales_transition(transaction: dict, old_status: Optional[str], new_status: str):
+    """Move a transaction from its old status bucket to the new one in the daily and monthly rollups."""
+    # Each bucket remembers the transitions it has applied, so replaying one after a crash is a no-op
+    transition_id = f"{transaction['id']}:{old_status}>{new_status}"
+    amount_cents = round(transaction["amount"] * 100)
+    operations = []
+    for granularity, period_format in SALES_ROLLUP_GRANULARITIES.items():
+        period = transaction["created_at"].strftime(period_format)
+        for status, sign in ((old_status, -1), (new_status, 1)):
+            if status is None:
+                continue
+            operations.append(UpdateOne(
+                {"_id": sales_rollup_id(granularity, period, transaction["course_package"], status), "transitions": {"$ne": transition_id}},
+                {
+                    "$inc": {"count": sign, "revenue_cents": sign * amount_cents},
+                    "$push": {"transitions": transition_id},
+                    "$setOnInsert": {
+                        "granularity": granularity,
+                        "period": period,
+                        "course_package": transaction["course_package"],
+                        "status": status
+                    }
+                },
+                upsert=True
+            ))
+    try:
+        await db.sales_rollups.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # A duplicate key means the bucket exists: it either has this transition already or was just created by a concurrent upsert
+        duplicates = [error["index"] for error in e.details["writeErrors"] if error["code"] == DUPLICATE_KEY_ERROR]
+        if len(duplicates) != len(e.details["writeErrors"]):
+            raise
+        for index in duplicates:
+            await db.sales_rollups.update_one(operations[index]._filter, operations[index]._doc)
+
+async def sync_transaction_rollups(transaction_id: str):
+    """Apply a transaction's pending status change to the rollups and clear its marker."""
+    transaction = await db.payment_transactions.find_one({"id": transaction_id})
+    if transaction is None or "rollup_pending_at" not in transaction:
+        return
+    
+    counted_status = transaction.get("rollup_status")
+    if counted_status != transaction["status"]:
+        await record_sales_transition(transaction, counted_status, transaction["status"])
+        await db.payment_transactions.update_one(
+            {"id": transaction_id, "rollup_status": counted_status},
+            {"$set": {"rollup_status": transaction["status"]}}
+        )
+    # A newer status change sets a new marker and clears it itself
+    await db.payment_transactions.update_one(
+        {"id": transaction_id, "status": transaction["status"], "rollup_pending_at": transaction["rollup_pending_at"]},
+        {"$unset": {"rollup_pending_at": ""}}
+    )
+
+async def apply_sales_transition(transaction_id: str):
+    """Sync the rollups after a status write, leaving the marker for reconciliation on failure."""
+    try:
+        await sync_transaction_rollups(transaction_id)
+    except Exception:
+        logger.exception("Failed to update sales rollups for transaction %s", transaction_id)
+
+async def reconcile_sales_rollups() -> int:
+    """Finish rollup updates that a failed or interrupted request left pending."""
+    cutoff = datetime.utcnow() - timedelta(seconds=SALES_ROLLUP_RECONCILE_AFTER_SECONDS)
+    pending = await db.payment_transactions.find(
+        {"rollup_pending_at": {"$lt": cutoff}}, {"id": 1}
+    ).to_list(length=None)
+    for transaction in pending:
+        await sync_transaction_rollups(transaction["id"])
+    return len(pending)
+
+async def create_sales_indexes():
+    await db.sales_rollups.create_index([("granularity", 1), ("period", 1)])
+    await db.payment_transactions.create_index("id")
+    await db.payment_transactions.create_index("rollup_pending_at", sparse=True)
+
+def sales_rollup_bucket(granularity: str, period: dict) -> dict:
+    return {
+        "granularity": granularity,
+        "period": period,
+        "course_package": "$_id.course_package",
+        "status": "$_id.status",
+        "count": "$count",
+        "revenue_cents": "$revenue_cents"
+    }
+
+async def rebuild_sales_rollups():
+    """Recompute all rollups from payment_transactions and atomically replace the collection."""
+    # Every status is recounted below, so nothing is left pending against the new rollups
+    await db.payment_transactions.update_many(
+        {},
+        [{"$set": {"rollup_status": "$status"}}, {"$unset": "rollup_pending_at"}]
+    )
+    day = {"$dateToString": {"format": SALES_ROLLUP_GRANULARITIES["day"], "date": "$created_at"}}
+    pipeline = [
+        {"$group": {
+            "_id": {"day": day, "course_package": "$course_package", "status": "$status"},
+            "count": {"$sum": 1},
+            "revenue_cents": {"$sum": {"$toLong": {"$round": [{"$multiply": ["$amount", 100]}, 0]}}}
+        }},
+        {"$project": {"_id": 0, "buckets": [
+            sales_rollup_bucket("day", "$_id.day"),
+            sales_rollup_bucket("month", {"$substrBytes": ["$_id.day", 0, 7]})
+        ]}},
+        {"$unwind": "$buckets"},
+        {"$group": {
+            "_id": {
+                "granularity": "$buckets.granularity",
+                "period": "$buckets.period",
+                "course_package": "$buckets.course_package",
+                "status": "$buckets.status"
+            },
+            "count": {"$sum": "$buckets.count"},
+            "revenue_cents": {"$sum": "$buckets.revenue_cents"}
+        }},
+        {"$project": {
+            "_id": {"$concat": ["$_id.granularity", "|", "$_id.period", "|", "$_id.course_package", "|", "$_id.status"]},
+            "granularity": "$_id.granularity",
+            "period": "$_id.period",
+            "course_package": "$_id.course_package",
+            "status": "$_id.status",
+            "count": 1,
+            "revenue_cents": 1
+        }},
+        {"$out": "sales_rollups"}
+    ]
+    await db.payment_transactions.aggregate(pipeline).to_list(length=None)
+    await create_sales_indexes()
+
+def resolve_export_columns(collection: str, columns: Optional[str]) -> List[str]:
+    """Validate a comma-separated column selection; all columns when none is given."""
+    if collection not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown export collection: {collection}")
+    available = EXPORT_COLUMNS[collection]
+    if not columns:
+        return list(available)
+    
+    selected = [column.strip() for column in columns.split(",") if column.strip()]
+    unknown = [column for column in selected if column not in available]
+    if not selected or unknown:
+        raise ValueError(f"Unknown columns for {collection}: {', '.join(unknown)}")
+    return selected
+
+def parse_export_date(value: Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+async def iter_export_batches(collection: str, columns: List[str], start: Optional[datetime], end: Optional[datetime]):
+    """Yield lists of at most EXPORT_BATCH_SIZE documents, filtered and projected by MongoDB."""
+    query = {}
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end + timedelta(days=1)
+    
+    projection = {"_id": 0, **{column: 1 for column in columns}}
+    cursor = db[collection].find(query, projection).batch_size(EXPORT_BATCH_SIZE)
+    try:
+        while True:
+            rows = await cursor.to_list(length=EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        # Also runs when a client disconnects mid-export, so the server-side cursor is not left open
+        await cursor.close()
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ";".join(str(item) for item in value)
+    return value
+
+async def export_csv(batches, columns: List[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    
+    try:
+        async for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([[csv_value(row.get(column)) for column in columns] for row in rows])
+            yield buffer.getvalue()
+    finally:
+        await batches.aclose()
+
+class ExportSink(io.RawIOBase):
+    """Write-only file whose tell() keeps counting across drains, as the Parquet footer needs."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def parquet_schema(collection: str, columns: List[str]):
+    import pyarrow as pa
+    
+    types = {
+        "string": pa.string(),
+        "bool": pa.bool_(),
+        "float": pa.float64(),
+        "datetime": pa.timestamp("ms"),
+        "list": pa.list_(pa.string())
+    }
+    return pa.schema([(column, types[EXPORT_COLUMNS[collection][column]]) for column in columns])
+
+def write_parquet_row_group(writer, schema, rows: List[dict]):
+    import pandas as pd
+    import pyarrow as pa
+    
+    frame = pd.DataFrame.from_records(rows, columns=schema.names)
+    # Columns missing from a whole batch come back as float NaN; normalise to None first
+    frame = frame.astype(object).where(frame.notna(), None)
+    for field in schema:
+        if field.type == pa.string():
+            frame[field.name] = frame[field.name].map(str, na_action="ignore")
+        elif isinstance(field.type, pa.ListType):
+            frame[field.name] = frame[field.name].map(lambda value: [str(item) for item in value], na_action="ignore")
+    writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+async def export_parquet(batches, collection: str, columns: List[str]):
+    import pyarrow.parquet as pq
+    
+    schema = parquet_schema(collection, columns)
+    sink = ExportSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        # One row group per batch; conversion runs in the threadpool to keep the event loop free
+        async for rows in batches:
+            await run_in_threadpool(write_parquet_row_group, writer, schema, rows)
+            yield sink.drain()
+    finally:
+        writer.close()
+        await batches.aclose()
+    yield sink.drain()
+
+def export_stream(collection: str, export_format: str, columns: List[str], start: Optional[datetime], end: Optional[datetime]):
+    batches = iter_export_batches(collection, columns, start, end)
+    if export_format == "csv":
+        return export_csv(batches, columns)
+    return export_parquet(batches, collection, columns)
+
+def build_import_item(entry, archive_names: Set[str]) -> dict:
+    """Turn one manifest entry into a job item; invalid entries are marked failed up front."""
+    item = {"file": None, "title": None, "status": "pending", "error": None, "content_id": None}
+    if not isinstance(entry, dict):
+        item.update(status="failed", error="Manifest entry must be an object")
+        return item
+    
+    wrong_type = [
+        field for field in ("file", "title", "description", "content_type", "section", "chapter")
+        if entry.get(field) is not None and not isinstance(entry[field], str)
+    ]
+    if wrong_type:
+        item.update(status="failed", error=f"Fields must be strings: {', '.join(wrong_type)}")
+        return item
+    
+    item["file"] = entry.get("file")
+    item["title"] = entry.get("title")
+    extension = os.path.splitext(item["file"] or "")[1].lower()
+    metadata = {
+        "title": entry.get("title"),
+        "description": entry.get("description") or "",
+        "content_type": entry.get("content_type") or CONTENT_TYPES_BY_EXTENSION.get(extension),
+        "section": entry.get("section"),
+        "chapter": entry.get("chapter"),
+        "price": entry.get("price")
+    }
+    item["metadata"] = metadata
+    
+    missing = [field for field in ("title", "content_type", "section") if not metadata[field]]
+    if not item["file"]:
+        missing.insert(0, "file")
+    if missing:
+        item.update(status="failed", error=f"Missing fields: {', '.join(missing)}")
+    elif item["file"] not in archive_names:
+        item.update(status="failed", error="File not found in archive")
+    elif metadata["price"] is not None:
+        try:
+            # bool is an int subclass, and json.loads accepts NaN and Infinity
+            if isinstance(metadata["price"], bool):
+                raise ValueError
+            metadata["price"] = float(metadata["price"])
+            if not math.isfinite(metadata["price"]) or metadata["price"] < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            item.update(status="failed", error="Invalid price")
+    
+    return item
+
+def read_import_manifest(archive_path: str, manifest: Optional[bytes]) -> List[dict]:
+    """Validate the archive and its manifest, returning one job item per entry."""
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            archive_names = set(archive.namelist())
+            if manifest is None:
+                if IMPORT_MANIFEST_NAME not in archive_names:
+                    raise ValueError(f"Archive has no {IMPORT_MANIFEST_NAME}")
+                manifest = archive.read(IMPORT_MANIFEST_NAME)
+    except zipfile.BadZipFile:
+        raise ValueError("Archive is not a valid zip file")
+    
+    try:
+        entries = json.loads(manifest)
+    except ValueError:
+        raise ValueError("Manifest is not valid JSON")
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("Manifest must be a non-empty list of entries")
+    
+    return [build_import_item(entry, archive_names) for entry in entries]
+
+def save_upload_to_temp(upload) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+        try:
+            shutil.copyfileobj(upload, f, IMPORT_CHUNK_SIZE)
+        except BaseException:
+            os.remove(f.name)
+            raise
+    return f.name
+
+async def create_import_job(items: List[dict], created_by: str) -> dict:
+    failed = sum(1 for item in items if item["status"] == "failed")
+    job = {
+        "id": str(uuid.uuid4()),
+        "status": "pending",
+        "total": len(items),
+        "processed": failed,
+        "failed": failed,
+        "items": items,
+        "created_at": datetime.utcnow(),
+        "created_by": created_by
+    }
+    await db.import_jobs.insert_one(job)
+    return job
+
+async def stream_archive_entry(archive_path: str, name: str, bucket: AsyncIOMotorGridFSBucket):
+    """Copy one archive entry into GridFS chunk by chunk and return its file id."""
+    archive = await run_in_threadpool(zipfile.ZipFile, archive_path)
+    try:
+        member = await run_in_threadpool(archive.open, name)
+        grid_in = bucket.open_upload_stream(os.path.basename(name))
+        try:
+            while True:
+                chunk = await run_in_threadpool(member.read, IMPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                await grid_in.write(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        finally:
+            member.close()
+        await grid_in.close()
+        return grid_in._id
+    finally:
+        archive.close()
+
+async def import_content_item(job_id: str, index: int, item: dict, archive_path: str,
+                              bucket: AsyncIOMotorGridFSBucket, semaphore: asyncio.Semaphore, uploaded_by: str):
+    async with semaphore:
+        try:
+            file_id = await stream_archive_entry(archive_path, item["file"], bucket)
+        except Exception as e:
+            await db.import_jobs.update_one(
+                {"id": job_id},
+                {
+                    "$set": {f"items.{index}.status": "failed", f"items.{index}.error": str(e)},
+                    "$inc": {"processed": 1, "failed": 1}
+                }
+            )
+            return None
+    
+    await db.import_jobs.update_one({"id": job_id}, {"$set": {f"items.{index}.status": "stored"}})
+    return index, {
+        "id": str(uuid.uuid4()),
+        **item["metadata"],
+        "file_id": file_id,
+        "filename": os.path.basename(item["file"]),
+        "created_at": datetime.utcnow(),
+        "uploaded_by": uploaded_by,
+        "import_job_id": job_id
+    }
+
+async def import_archive_entries(job_id: str, archive_path: str, uploaded_by: str):
+    """Stream every pending entry into GridFS, then insert all content metadata in one batch."""
+    job = await db.import_jobs.find_one({"id": job_id})
+    await db.import_jobs.update_one({"id": job_id}, {"$set": {"status": "running"}})
+    
+    bucket = AsyncIOMotorGridFSBucket(db)
+    semaphore = asyncio.Semaphore(IMPORT_CONCURRENCY)
+    results = await asyncio.gather(*[
+        import_content_item(job_id, index, item, archive_path, bucket, semaphore, uploaded_by)
+        for index, item in enumerate(job["items"])
+        if item["status"] == "pending"
+    ])
+    stored = [result for result in results if result]
+    
+    if stored:
+        try:
+            await db.course_content.insert_many([content_doc for _, content_doc in stored])
+        except Exception as e:
+            error = f"Failed to save content metadata: {str(e)}"
+            failed = {"status": "failed", "error": error, "completed_at": datetime.utcnow()}
+            for index, _ in stored:
+                failed[f"items.{index}.status"] = "failed"
+                failed[f"items.{index}.error"] = error
+            await db.import_jobs.update_one(
+                {"id": job_id},
+                {"$set": failed, "$inc": {"processed": len(stored), "failed": len(stored)}}
+            )
+            # insert_many is ordered, so some documents may have been saved before the error
+            try:
+                await db.course_content.delete_many({"import_job_id": job_id})
+            except Exception:
+                logger.exception("Failed to remove content of import job %s; keeping its GridFS files", job_id)
+                return
+            # Best effort: no content document references these files any more
+            for _, content_doc in stored:
+                try:
+                    await bucket.delete(content_doc["file_id"])
+                except Exception:
+                    logger.exception("Failed to delete GridFS file %s of import job %s", content_doc["file_id"], job_id)
+            return
+        
+        done = {}
+        for index, content_doc in stored:
+            done[f"items.{index}.status"] = "done"
+            done[f"items.{index}.content_id"] = content_doc["id"]
+        await db.import_jobs.update_one({"id": job_id}, {"$set": done, "$inc": {"processed": len(stored)}})
+        await asyncio.gather(*[publish_new_content_media(content_doc, semaphore) for _, content_doc in stored])
+    
+    await db.import_jobs.update_one(
+        {"id": job_id},
+        {"$set": {"status": "completed", "completed_at": datetime.utcnow()}}
+    )
+
+async def run_content_import(job_id: str, archive_path: str, uploaded_by: str):
+    """Run an import job; unexpected errors mark it failed so pollers never wait on a dead job."""
+    try:
+        await import_archive_entries(job_id, archive_path, uploaded_by)
+    except Exception as e:
+        logger.exception("Content import job %s failed", job_id)
+        try:
+            await db.import_jobs.update_one(
+                {"id": job_id},
+                {"$set": {"status": "failed", "error": f"Import failed: {str(e)}", "completed_at": datetime.utcnow()}}
+            )
+        except Exception:
+            logger.exception("Failed to mark content import job %s as failed", job_id)
+
+async def run_uploaded_content_import(job_id: str, archive_path: str, uploaded_by: str):
+    try:
+        await run_content_import(job_id, archive_path, uploaded_by)
+    finally:
+        os.remove(archive_path)
+
+def content_media_type(content: dict) -> str:
+    if content["content_type"] == "video":
+        return "video/mp4"
+    if content["content_type"] == "powerpoint":
+        return "application/vnd.ms-powerpoint"
+    return "application/octet-stream"
+
+async def check_content_access(content: dict, email: str):
+    user = await db.users.find_one({"email": email})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if content["section"] == "corso_completo" and not user.get("is_premium", False):
+        raise HTTPException(status_code=403, detail="Premium access required")
+    
+    if content["section"] == "premium":
+        purchased_courses = user.get("purchased_courses", [])
+        if content["_id"] not in purchased_courses:
+            raise HTTPException(status_code=403, detail="Content not purchased")
+
+async def iter_content_file(content: dict):
+    """Yield the file bytes of a content document from GridFS or its base64 field."""
+    # Imported content lives in GridFS and is streamed chunk by chunk
+    if content.get("file_id"):
+        grid_out = await AsyncIOMotorGridFSBucket(db).open_download_stream(content["file_id"])
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+    else:
+        yield base64.b64decode(content["file_content"])
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    # boto3 is only needed when media is delivered from the object store
+    import boto3
+    return boto3.client("s3", endpoint_url=S3_ENDPOINT_URL)
+
+def media_storage_key(content: dict) -> str:
+    extension = os.path.splitext(os.path.basename(content.get("filename") or ""))[1].lower()
+    if not MEDIA_EXTENSION_PATTERN.match(extension):
+        extension = ""
+    key = f"content/{content['id']}{extension}"
+    if not MEDIA_STORAGE_KEY_PATTERN.match(key):
+        raise ValueError(f"Cannot derive a storage key for content {content['id']!r}")
+    return key
+
+def media_file_path(key: str) -> str:
+    """Resolve a storage key under MEDIA_ROOT, refusing anything that would escape it."""
+    root = os.path.realpath(MEDIA_ROOT)
+    path = os.path.realpath(os.path.join(root, key))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Storage key {key!r} resolves outside MEDIA_ROOT")
+    return path
+
+def create_media_token(content: dict, email: str):
+    """Sign a media link for one content version; returns (token, expires_at)."""
+    # No "sub" claim, so a media link can never pass as an access token
+    issued_at = datetime.utcnow()
+    expires_at = issued_at + timedelta(seconds=MEDIA_URL_TTL_SECONDS)
+    token = jwt.encode(
+        {
+            "typ": "media",
+            "cid": content["id"],
+            "ver": content.get("media_version", 0),
+            "usr": email,
+            "iat": issued_at,
+            "exp": expires_at
+        },
+        SECRET_KEY,
+        algorithm=ALGORITHM
+    )
+    return token, expires_at
+
+def decode_media_token(token: str) -> dict:
+    try:
+        # Leeway absorbs clock differences between API hosts
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"leeway": MEDIA_CLOCK_SKEW_SECONDS})
+    except JWTError:
+        raise HTTPException(status_code=403, detail="Invalid or expired media link")
+    if payload.get("typ") != "media":
+        raise HTTPException(status_code=403, detail="Invalid or expired media link")
+    return payload
+
+async def publish_content_media(content: dict) -> str:
+    """Copy a content file into the configured media store and record its storage key."""
+    key = media_storage_key(content)
+    if MEDIA_BACKEND == "s3":
+        with tempfile.SpooledTemporaryFile(max_size=8 * IMPORT_CHUNK_SIZE) as spool:
+            async for chunk in iter_content_file(content):
+                spool.write(chunk)
+            spool.seek(0)
+            await run_in_threadpool(
+                get_s3_client().upload_fileobj, spool, S3_BUCKET, key,
+                ExtraArgs={"ContentType": content_media_type(content)}
+            )
+    elif MEDIA_BACKEND == "nginx":
+        path = media_file_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            async for chunk in iter_content_file(content):
+                f.write(chunk)
+    else:
+        raise ValueError("MEDIA_BACKEND must be 's3' or 'nginx' to publish media")
+    
+    await db.course_content.update_one({"id": content["id"]}, {"$set": {"storage_key": key}})
+    return key
+
+async def publish_new_content_media(content: dict, semaphore: Optional[asyncio.Semaphore] = None):
+    """Publish newly stored content when a media store is configured; on failure the API keeps streaming it."""
+    if MEDIA_BACKEND not in ("s3", "nginx"):
+        return
+    try:
+        async with semaphore or asyncio.Semaphore():
+            await publish_content_media(content)
+    except Exception:
+        logger.exception("Failed to publish content %s to %s; run manage.py publish-media to retry", content["id"], MEDIA_BACKEND)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
@@ -290,6 +1141,7 @@ async def request_booking(booking: BookingRequest):
     }
     
     result = await db.bookings.insert_one(booking_doc)
+    booking_events.publish("insert", booking_doc)
     return {"message": "Booking request submitted successfully", "booking_id": booking_doc["id"]}
 
 @app.get("/api/bookings/my")
@@ -314,6 +1166,7 @@ async def create_paypal_order(order_request: PayPalOrderRequest, current_user: s
         
         # Create transaction record
         transaction_id = str(uuid.uuid4())
+        created_at = datetime.utcnow()
         transaction_doc = {
             "id": transaction_id,
             "order_id": order_id,
@@ -322,12 +1175,14 @@ async def create_paypal_order(order_request: PayPalOrderRequest, current_user: s
             "amount": package["price"],
             "currency": package["currency"],
             "status": "pending",
-            "created_at": datetime.utcnow(),
-            "paypal_order_id": order_id
+            "created_at": created_at,
+            "paypal_order_id": order_id,
+            "rollup_pending_at": created_at
         }
         
         # Store in MongoDB
         await db.payment_transactions.insert_one(transaction_doc)
+        await apply_sales_transition(transaction_id)
         
         return {
             "order_id": order_id,
@@ -344,20 +1199,24 @@ async def capture_paypal_order(order_id: str, current_user: str = Depends(get_cu
     try:
         # For now, simulate successful capture (will be replaced with actual PayPal integration)
         
-        # Update transaction in database
-        update_result = await db.payment_transactions.update_one(
+        # Update transaction in database, marking the sales rollups as pending in the same write
+        now = datetime.utcnow()
+        previous = await db.payment_transactions.find_one_and_update(
             {"paypal_order_id": order_id},
             {
                 "$set": {
                     "status": "completed",
-                    "completed_at": datetime.utcnow()
+                    "completed_at": now,
+                    "rollup_pending_at": now
                 }
             }
         )
         
-        if update_result.matched_count == 0:
+        if previous is None:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
+        await apply_sales_transition(previous["id"])
+        
         # Get updated transaction
         transaction = await db.payment_transactions.find_one({"paypal_order_id": order_id})
         
@@ -376,11 +1235,13 @@ async def capture_paypal_order(order_id: str, current_user: str = Depends(get_cu
         }
         
     except Exception as e:
-        # Update transaction status to failed
-        await db.payment_transactions.update_one(
-            {"paypal_order_id": order_id},
-            {"$set": {"status": "failed"}}
+        # Update transaction status to failed, unless the capture itself already went through
+        previous = await db.payment_transactions.find_one_and_update(
+            {"paypal_order_id": order_id, "status": {"$nin": ["completed", "failed"]}},
+            {"$set": {"status": "failed", "rollup_pending_at": datetime.utcnow()}}
         )
+        if previous is not None:
+            await apply_sales_transition(previous["id"])
         raise HTTPException(status_code=500, detail=f"Failed to capture payment: {str(e)}")
 
 @app.get("/api/payment/packages")
@@ -423,8 +1284,49 @@ async def upload_content(
     }
     
     result = await db.course_content.insert_one(content_doc)
+    await publish_new_content_media(content_doc)
     return {"message": "Content uploaded successfully", "content_id": content_doc["id"]}
 
+@app.post("/api/admin/content/import")
+async def import_content(
+    background_tasks: BackgroundTasks,
+    archive: UploadFile = File(...),
+    manifest: UploadFile = File(None),
+    current_user: str = Depends(get_current_user)
+):
+    # Check if user is admin
+    user = await db.users.find_one({"email": current_user})
+    if not user or not user.get("is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    # Keep the archive on disk; entries are streamed from it by the background job
+    archive_path = await run_in_threadpool(save_upload_to_temp, archive.file)
+    try:
+        manifest_content = await manifest.read() if manifest else None
+        items = await run_in_threadpool(read_import_manifest, archive_path, manifest_content)
+        job = await create_import_job(items, current_user)
+    except ValueError as e:
+        os.remove(archive_path)
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        os.remove(archive_path)
+        raise
+    
+    background_tasks.add_task(run_uploaded_content_import, job["id"], archive_path, current_user)
+    return {"message": "Content import started", "job_id": job["id"], "total": job["total"]}
+
+@app.get("/api/admin/content/import/{job_id}")
+async def get_import_job(job_id: str, current_user: str = Depends(get_current_user)):
+    # Check if user is admin
+    user = await db.users.find_one({"email": current_user})
+    if not user or not user.get("is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    job = await db.import_jobs.find_one({"id": job_id}, {"_id": 0, "items.metadata": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
 @app.get("/api/admin/bookings")
 async def get_all_bookings(current_user: str = Depends(get_current_user)):
     # Check if user is admin
@@ -436,6 +1338,156 @@ async def get_all_bookings(current_user: str = Depends(get_current_user)):
     serialized_bookings = [serialize_mongodb_doc(booking) for booking in bookings]
     return {"bookings": serialized_bookings}
 
+@app.get("/api/admin/bookings/stream")
+async def stream_bookings(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    current_user: str = Depends(get_current_user)
+):
+    # Check if user is admin
+    user = await db.users.find_one({"email": current_user})
+    if not user or not user.get("is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    # Push booking inserts and status changes; a "reset" event tells the client to reload the full list
+    change_stream = await open_booking_change_stream(last_event_id)
+    if change_stream is None:
+        events = local_booking_events(request, last_event_id)
+    else:
+        events = change_stream_booking_events(request, *change_stream)
+    
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.put("/api/admin/bookings/{booking_id}/status")
+async def update_booking_status(
+    booking_id: str,
+    update: BookingStatusUpdate,
+    current_user: str = Depends(get_current_user)
+):
+    # Check if user is admin
+    user = await db.users.find_one({"email": current_user})
+    if not user or not user.get("is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if update.status not in BOOKING_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid booking status")
+    
+    booking = await db.bookings.find_one_and_update(
+        {"id": booking_id},
+        {"$set": {"status": update.status, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    
+    booking_events.publish("status", booking)
+    return {"message": "Booking status updated successfully", "booking": serialize_mongodb_doc(booking)}
+
+@app.get("/api/admin/sales")
+async def get_sales_dashboard(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    granularity: str = "day",
+    current_user: str = Depends(get_current_user)
+):
+    # Check if user is admin
+    user = await db.users.find_one({"email": current_user})
+    if not user or not user.get("is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if granularity not in SALES_ROLLUP_GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Invalid granularity")
+    
+    try:
+        end_date = datetime.strptime(end, "%Y-%m-%d") if end else datetime.utcnow()
+        start_date = datetime.strptime(start, "%Y-%m-%d") if start else end_date - timedelta(days=SALES_DASHBOARD_DEFAULT_DAYS)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    
+    await reconcile_sales_rollups()
+    
+    # Rollups hold one document per period, package and status, so the cost does not grow with transactions
+    period_format = SALES_ROLLUP_GRANULARITIES[granularity]
+    rollups = await db.sales_rollups.find({
+        "granularity": granularity,
+        "period": {"$gte": start_date.strftime(period_format), "$lte": end_date.strftime(period_format)}
+    }, {"transitions": 0}).sort("period", 1).to_list(length=None)
+    
+    series = []
+    totals: Dict[str, Dict[str, Dict]] = {}
+    for rollup in rollups:
+        if rollup["count"] == 0:
+            continue
+        series.append({
+            "period": rollup["period"],
+            "course_package": rollup["course_package"],
+            "status": rollup["status"],
+            "count": rollup["count"],
+            "revenue": rollup["revenue_cents"] / 100
+        })
+        total = totals.setdefault(rollup["course_package"], {}).setdefault(
+            rollup["status"], {"count": 0, "revenue_cents": 0}
+        )
+        total["count"] += rollup["count"]
+        total["revenue_cents"] += rollup["revenue_cents"]
+    
+    for package_totals in totals.values():
+        for total in package_totals.values():
+            total["revenue"] = total.pop("revenue_cents") / 100
+    
+    return {
+        "granularity": granularity,
+        "start": start_date.strftime("%Y-%m-%d"),
+        "end": end_date.strftime("%Y-%m-%d"),
+        "currency": "EUR",
+        "series": series,
+        "totals": totals
+    }
+
+@app.post("/api/admin/sales/rebuild")
+async def rebuild_sales_dashboard(background_tasks: BackgroundTasks, current_user: str = Depends(get_current_user)):
+    # Check if user is admin
+    user = await db.users.find_one({"email": current_user})
+    if not user or not user.get("is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    background_tasks.add_task(rebuild_sales_rollups)
+    return {"message": "Sales rollup rebuild started"}
+
+@app.get("/api/admin/export/{collection}")
+async def export_collection(
+    collection: str,
+    format: str = "csv",
+    columns: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: str = Depends(get_current_user)
+):
+    # Check if user is admin
+    user = await db.users.find_one({"email": current_user})
+    if not user or not user.get("is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid export format")
+    
+    try:
+        selected_columns = resolve_export_columns(collection, columns)
+        start_date = parse_export_date(start)
+        end_date = parse_export_date(end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        export_stream(collection, format, selected_columns, start_date, end_date),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={collection}.{format}"}
+    )
+
 @app.post("/api/admin/config")
 async def update_admin_config(config: AdminConfig, current_user: str = Depends(get_current_user)):
     # Check if user is admin
@@ -481,32 +1533,86 @@ async def get_content(content_id: str, current_user: str = Depends(get_current_u
         raise HTTPException(status_code=404, detail="Content not found")
     
     # Check access permissions
-    user = await db.users.find_one({"email": current_user})
-    if content["section"] == "corso_completo" and not user.get("is_premium", False):
-        raise HTTPException(status_code=403, detail="Premium access required")
+    await check_content_access(content, current_user)
     
-    if content["section"] == "premium":
-        purchased_courses = user.get("purchased_courses", [])
-        if content["_id"] not in purchased_courses:
-            raise HTTPException(status_code=403, detail="Content not purchased")
+    return StreamingResponse(
+        iter_content_file(content),
+        media_type=content_media_type(content),
+        headers={"Content-Disposition": f"inline; filename={content['filename']}"}
+    )
+
+@app.get("/api/content/{content_id}/download-url")
+async def get_content_download_url(content_id: str, current_user: str = Depends(get_current_user)):
+    content = await db.course_content.find_one({"id": content_id}, {"file_content": 0})
+    if not content:
+        raise HTTPException(status_code=404, detail="Content not found")
     
-    # Decode file content
-    file_content = base64.b64decode(content["file_content"])
+    # Entitlement is checked once here; the link itself is the credential until it expires
+    await check_content_access(content, current_user)
     
-    # Determine content type for response
-    if content["content_type"] == "video":
-        media_type = "video/mp4"
-    elif content["content_type"] == "powerpoint":
-        media_type = "application/vnd.ms-powerpoint"
-    else:
-        media_type = "application/octet-stream"
+    token, expires_at = create_media_token(content, current_user)
+    return {"url": f"/api/media/{token}", "expires_at": expires_at}
+
+@app.get("/api/media/{token}")
+async def get_media(token: str):
+    payload = decode_media_token(token)
+    content = await db.course_content.find_one({"id": payload["cid"]}, {"file_content": 0})
+    if not content or content.get("media_version", 0) != payload["ver"]:
+        raise HTTPException(status_code=403, detail="Media link has been revoked")
+    
+    media_type = content_media_type(content)
+    disposition = f"inline; filename={content['filename']}"
+    storage_key = content.get("storage_key")
+    if storage_key and not MEDIA_STORAGE_KEY_PATTERN.match(storage_key):
+        # Published before keys were derived from the content id; re-run publish-media --force
+        logger.warning("Ignoring malformed storage key for content %s", content["id"])
+        storage_key = None
     
+    if storage_key and MEDIA_BACKEND == "s3":
+        # Presigned until the link expires, plus leeway for the object store's clock
+        expires_in = max(payload["exp"] - int(time.time()), 0) + MEDIA_CLOCK_SKEW_SECONDS
+        url = await run_in_threadpool(
+            get_s3_client().generate_presigned_url,
+            "get_object",
+            Params={
+                "Bucket": S3_BUCKET,
+                "Key": storage_key,
+                "ResponseContentType": media_type,
+                "ResponseContentDisposition": disposition
+            },
+            ExpiresIn=expires_in
+        )
+        return RedirectResponse(url, status_code=307)
+    
+    if storage_key and MEDIA_BACKEND == "nginx":
+        return Response(headers={
+            "X-Accel-Redirect": NGINX_MEDIA_PREFIX + quote(storage_key),
+            "Content-Type": media_type,
+            "Content-Disposition": disposition
+        })
+    
+    # Not published to a media store yet: stream through the API
+    content = await db.course_content.find_one({"id": payload["cid"]})
     return StreamingResponse(
-        io.BytesIO(file_content),
+        iter_content_file(content),
         media_type=media_type,
-        headers={"Content-Disposition": f"inline; filename={content['filename']}"}
+        headers={"Content-Disposition": disposition}
     )
 
+@app.post("/api/admin/content/{content_id}/revoke-links")
+async def revoke_content_links(content_id: str, current_user: str = Depends(get_current_user)):
+    # Check if user is admin
+    user = await db.users.find_one({"email": current_user})
+    if not user or not user.get("is_admin", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    # Links carry the media version they were issued for; bumping it invalidates them all
+    result = await db.course_content.update_one({"id": content_id}, {"$inc": {"media_version": 1}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Content not found")
+    
+    return {"message": "Media links revoked successfully"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
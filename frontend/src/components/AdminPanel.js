@@ -12,12 +12,14 @@ const AdminPanel = () => {
         mode: 'sandbox'
     });
     const [bookings, setBookings] = useState([]);
+    const [sales, setSales] = useState(null);
+    const [salesGranularity, setSalesGranularity] = useState('day');
     const [loading, setLoading] = useState(false);
     const [message, setMessage] = useState('');
 
     useEffect(() => {
         fetchConfig();
-        fetchBookings();
+        return subscribeToBookings();
     }, []);
 
     const fetchConfig = async () => {
@@ -49,11 +51,147 @@ const AdminPanel = () => {
             
             if (response.ok) {
                 const data = await response.json();
-                setBookings(data.bookings);
+                return data.bookings;
             }
         } catch (error) {
             console.error('Error fetching bookings:', error);
         }
+        return null;
+    };
+
+    const fetchSales = async (granularity) => {
+        try {
+            const token = localStorage.getItem('token');
+            const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/admin/sales?granularity=${granularity}`, {
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+            
+            if (response.ok) {
+                const data = await response.json();
+                setSales(data);
+            }
+        } catch (error) {
+            console.error('Error fetching sales:', error);
+        }
+    };
+
+    useEffect(() => {
+        if (activeTab === 'sales') {
+            fetchSales(salesGranularity);
+        }
+    }, [activeTab, salesGranularity]);
+
+    const mergeBookings = (current, incoming) => {
+        const merged = [...current];
+        incoming.forEach(booking => {
+            const index = merged.findIndex(b => b.id === booking.id);
+            if (index === -1) {
+                merged.push(booking);
+            } else {
+                merged[index] = booking;
+            }
+        });
+        return merged;
+    };
+
+    // Live feed: the full list is loaded only when the server sends "reset",
+    // afterwards only inserts and status changes arrive. Reconnects resume via Last-Event-ID.
+    const subscribeToBookings = () => {
+        const controller = new AbortController();
+        let lastEventId = null;
+        let retryTimer = null;
+        // Events received while a reload is in flight; they are newer than or equal to the snapshot
+        let receivedDuringReload = null;
+
+        const reloadBookings = async () => {
+            const received = new Map();
+            receivedDuringReload = received;
+            const snapshot = await fetchBookings();
+            if (receivedDuringReload === received) {
+                receivedDuringReload = null;
+            }
+            if (snapshot && !controller.signal.aborted) {
+                setBookings(mergeBookings(snapshot, [...received.values()]));
+            }
+        };
+
+        const handleMessage = (raw) => {
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('id:')) {
+                    lastEventId = line.slice(3).trim();
+                } else if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+
+            if (event === 'reset') {
+                reloadBookings();
+            } else if (event === 'booking') {
+                const booking = JSON.parse(data).booking;
+                if (receivedDuringReload) {
+                    receivedDuringReload.set(booking.id, booking);
+                }
+                setBookings(prev => mergeBookings(prev, [booking]));
+            }
+        };
+
+        const connect = async () => {
+            try {
+                const token = localStorage.getItem('token');
+                const headers = { 'Authorization': `Bearer ${token}` };
+                if (lastEventId) {
+                    headers['Last-Event-ID'] = lastEventId;
+                }
+                const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/admin/bookings/stream`, {
+                    headers,
+                    signal: controller.signal
+                });
+
+                if (response.status === 401 || response.status === 403) {
+                    return;
+                }
+                if (!response.ok) {
+                    throw new Error(`Stream failed with status ${response.status}`);
+                }
+
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) {
+                        break;
+                    }
+                    buffer += decoder.decode(value, { stream: true });
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                        handleMessage(buffer.slice(0, boundary));
+                        buffer = buffer.slice(boundary + 2);
+                    }
+                }
+            } catch (error) {
+                if (controller.signal.aborted) {
+                    return;
+                }
+                console.error('Error streaming bookings:', error);
+            }
+
+            if (!controller.signal.aborted) {
+                retryTimer = setTimeout(connect, 3000);
+            }
+        };
+
+        connect();
+        return () => {
+            controller.abort();
+            clearTimeout(retryTimer);
+        };
     };
 
     const updatePayPalConfig = async () => {
@@ -223,6 +361,85 @@ const AdminPanel = () => {
         </div>
     );
 
+    const renderSalesTab = () => (
+        <div className="admin-sales">
+            <h3>Vendite</h3>
+
+            <div className="form-group">
+                <label>Raggruppamento</label>
+                <select
+                    value={salesGranularity}
+                    onChange={(e) => setSalesGranularity(e.target.value)}
+                    className="form-input"
+                >
+                    <option value="day">Giornaliero</option>
+                    <option value="month">Mensile</option>
+                </select>
+            </div>
+
+            {!sales ? (
+                <p>Caricamento...</p>
+            ) : (
+                <>
+                    <p>Periodo: {sales.start} - {sales.end}</p>
+                    <table className="admin-table">
+                        <thead>
+                            <tr>
+                                <th>Pacchetto</th>
+                                <th>Completate</th>
+                                <th>Ricavi</th>
+                                <th>In Attesa</th>
+                                <th>Fallite</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            {Object.entries(sales.totals).map(([coursePackage, statuses]) => (
+                                <tr key={coursePackage}>
+                                    <td>{coursePackage}</td>
+                                    <td>{statuses.completed?.count || 0}</td>
+                                    <td>€{(statuses.completed?.revenue || 0).toFixed(2)}</td>
+                                    <td>{statuses.pending?.count || 0}</td>
+                                    <td>{statuses.failed?.count || 0}</td>
+                                </tr>
+                            ))}
+                        </tbody>
+                    </table>
+
+                    <table className="admin-table">
+                        <thead>
+                            <tr>
+                                <th>Periodo</th>
+                                <th>Pacchetto</th>
+                                <th>Vendite</th>
+                                <th>Ricavi</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            {sales.series.filter(row => row.status === 'completed').map(row => (
+                                <tr key={`${row.period}-${row.course_package}`}>
+                                    <td>{row.period}</td>
+                                    <td>{row.course_package}</td>
+                                    <td>{row.count}</td>
+                                    <td>€{row.revenue.toFixed(2)}</td>
+                                </tr>
+                            ))}
+                        </tbody>
+                    </table>
+                </>
+            )}
+        </div>
+    );
+
+    const renderActiveTab = () => {
+        if (activeTab === 'config') {
+            return renderConfigTab();
+        }
+        if (activeTab === 'sales') {
+            return renderSalesTab();
+        }
+        return renderBookingsTab();
+    };
+
     return (
         <div className="admin-panel">
             <div className="admin-header">
@@ -240,11 +457,17 @@ const AdminPanel = () => {
                     >
                         Prenotazioni
                     </button>
+                    <button
+                        className={`tab-button ${activeTab === 'sales' ? 'active' : ''}`}
+                        onClick={() => setActiveTab('sales')}
+                    >
+                        Vendite
+                    </button>
                 </div>
             </div>
 
             <div className="admin-content">
-                {activeTab === 'config' ? renderConfigTab() : renderBookingsTab()}
+                {renderActiveTab()}
             </div>
         </div>
     );
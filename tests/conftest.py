@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# server.py lives in backend/ and is imported as a top-level module, like uvicorn and manage.py do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import server  # noqa: E402
+
+
+class FakeDatabase:
+    """Stand-in for server.db exposing only the collection fakes a test provides."""
+
+    def __init__(self, **collections):
+        for name, collection in collections.items():
+            setattr(self, name, collection)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Replace server.db for one test: fake_db(bookings=FakeBookings(...))."""
+    def install(**collections):
+        database = FakeDatabase(**collections)
+        monkeypatch.setattr(server, "db", database)
+        return database
+    return install
@@ -0,0 +1,193 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+def booking(booking_id, status="pending"):
+    return {"_id": "object-id", "id": booking_id, "user_email": "a@example.com", "status": status}
+
+
+def test_publish_keeps_booking_id_over_mongo_id():
+    broker = server.BookingEventBroker()
+    broker.publish("insert", booking("b1"))
+
+    sequence, data = broker.buffer[-1]
+    assert sequence == 1
+    assert data == {"type": "insert", "booking": {"id": "b1", "user_email": "a@example.com", "status": "pending"}}
+
+
+def test_fresh_subscription_requires_reload():
+    broker = server.BookingEventBroker()
+    broker.publish("insert", booking("b1"))
+
+    _, missed = broker.subscribe(None)
+    assert missed is None
+
+
+def test_resume_replays_missed_events():
+    broker = server.BookingEventBroker()
+    for index in range(3):
+        broker.publish("insert", booking(f"b{index}"))
+
+    _, missed = broker.subscribe(f"{broker.epoch}-1")
+    assert [sequence for sequence, _ in missed] == [2, 3]
+
+
+def test_resume_at_latest_event_has_nothing_missed():
+    broker = server.BookingEventBroker()
+    broker.publish("insert", booking("b1"))
+
+    _, missed = broker.subscribe(broker.last_event_id)
+    assert missed == []
+
+
+@pytest.mark.parametrize("last_event_id", [
+    "other-1",        # issued by another process (epoch mismatch)
+    "not-a-number",
+    "garbage",
+])
+def test_foreign_or_malformed_ids_require_reload(last_event_id):
+    broker = server.BookingEventBroker()
+    broker.publish("insert", booking("b1"))
+
+    _, missed = broker.subscribe(last_event_id)
+    assert missed is None
+
+
+def test_id_beyond_current_sequence_requires_reload():
+    broker = server.BookingEventBroker()
+    broker.publish("insert", booking("b1"))
+
+    _, missed = broker.subscribe(f"{broker.epoch}-5")
+    assert missed is None
+
+
+def test_gap_after_buffer_eviction_requires_reload():
+    broker = server.BookingEventBroker(buffer_size=2)
+    for index in range(5):
+        broker.publish("insert", booking(f"b{index}"))
+
+    # Events 2 and 3 were evicted; only 4 and 5 remain
+    _, missed = broker.subscribe(f"{broker.epoch}-1")
+    assert missed is None
+    _, missed = broker.subscribe(f"{broker.epoch}-3")
+    assert [sequence for sequence, _ in missed] == [4, 5]
+
+
+def test_subscribers_receive_published_events():
+    async def scenario():
+        broker = server.BookingEventBroker()
+        queue, _ = broker.subscribe(None)
+        broker.publish("status", booking("b1", "confirmed"))
+        return await asyncio.wait_for(queue.get(), 1)
+
+    sequence, data = asyncio.run(scenario())
+    assert sequence == 1
+    assert data["type"] == "status"
+    assert data["booking"]["status"] == "confirmed"
+
+
+def test_slow_subscriber_is_dropped_when_its_queue_is_full():
+    async def scenario():
+        broker = server.BookingEventBroker(buffer_size=2)
+        slow, _ = broker.subscribe(None)
+        for index in range(3):
+            broker.publish("insert", booking(f"b{index}"))
+        return broker, slow
+
+    broker, slow = asyncio.run(scenario())
+    assert slow not in broker.subscribers
+    assert slow.qsize() == 2
+
+
+def test_format_uses_epoch_qualified_ids():
+    broker = server.BookingEventBroker()
+    broker.publish("insert", booking("b1"))
+
+    message = broker.format(broker.buffer[-1])
+    assert message.startswith(f"id: {broker.epoch}-1\nevent: booking\ndata: ")
+    assert message.endswith("\n\n")
+
+
+class FakeChangeStream:
+    def __init__(self, changes=(), resume_token=None, error=None):
+        self.changes = list(changes)
+        self.resume_token = resume_token
+        self.error = error
+        self.closed = False
+
+    async def try_next(self):
+        if self.error:
+            raise self.error
+        return self.changes.pop(0) if self.changes else None
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBookings:
+    def __init__(self, streams):
+        self.streams = list(streams)
+        self.calls = []
+
+    def watch(self, pipeline, **kwargs):
+        self.calls.append(kwargs)
+        return self.streams.pop(0)
+
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.fixture
+def fake_bookings(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "change_streams_supported", None)
+    return lambda *streams: fake_db(bookings=FakeBookings(streams)).bookings
+
+
+def test_open_change_stream_only_probes_briefly(fake_bookings):
+    probe = FakeChangeStream(resume_token={"_data": "token-now"})
+    bookings = fake_bookings(probe)
+
+    opened = asyncio.run(server.open_booking_change_stream(None))
+
+    assert opened == ({"_data": "token-now"}, False)
+    assert bookings.calls[0]["max_await_time_ms"] == server.BOOKING_FEED_PROBE_MS
+    assert probe.closed
+
+
+def test_open_change_stream_falls_back_on_standalone(fake_bookings):
+    fake_bookings(FakeChangeStream(error=server.OperationFailure("no replica set", code=40573)))
+
+    assert asyncio.run(server.open_booking_change_stream(None)) is None
+    assert server.change_streams_supported is False
+
+
+def test_open_change_stream_restarts_on_lost_resume_token(fake_bookings):
+    bookings = fake_bookings(
+        FakeChangeStream(error=server.OperationFailure("history lost", code=286)),
+        FakeChangeStream(resume_token={"_data": "token-now"})
+    )
+
+    opened = asyncio.run(server.open_booking_change_stream("expired"))
+
+    assert opened == ({"_data": "token-now"}, False)
+    assert bookings.calls[0]["resume_after"] == {"_data": "expired"}
+    assert bookings.calls[1]["resume_after"] is None
+
+
+def test_change_stream_feed_sends_reset_before_waiting(fake_bookings):
+    bookings = fake_bookings(FakeChangeStream())
+
+    async def first_event():
+        events = server.change_stream_booking_events(FakeRequest(), {"_data": "token-now"}, False)
+        try:
+            return await events.__anext__()
+        finally:
+            await events.aclose()
+
+    assert asyncio.run(first_event()).startswith("id: token-now\nevent: reset\n")
+    assert bookings.calls == []
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import zipfile
+
+import pytest
+
+import server
+
+ARCHIVE_NAMES = {"lesson1.mp4", "slides.pptx"}
+
+
+def entry(**overrides):
+    return {"file": "lesson1.mp4", "title": "Lesson 1", "section": "premium", **overrides}
+
+
+def test_valid_entry_is_pending_with_derived_content_type():
+    item = server.build_import_item(entry(price="9.5", chapter="Capitolo 1"), ARCHIVE_NAMES)
+
+    assert item["status"] == "pending"
+    assert item["metadata"] == {
+        "title": "Lesson 1",
+        "description": "",
+        "content_type": "video",
+        "section": "premium",
+        "chapter": "Capitolo 1",
+        "price": 9.5
+    }
+
+
+@pytest.mark.parametrize("manifest_entry, error", [
+    ("lesson1.mp4", "Manifest entry must be an object"),
+    (entry(file=["lesson1.mp4"]), "Fields must be strings: file"),
+    (entry(title=3, section={"name": "premium"}), "Fields must be strings: title, section"),
+    (entry(file=None, section=None), "Missing fields: file, content_type, section"),
+    (entry(file="notes.txt"), "Missing fields: content_type"),
+    (entry(file="missing.pdf"), "File not found in archive"),
+])
+def test_invalid_entries_fail_per_item(manifest_entry, error):
+    item = server.build_import_item(manifest_entry, ARCHIVE_NAMES)
+
+    assert item["status"] == "failed"
+    assert item["error"] == error
+
+
+@pytest.mark.parametrize("price", ["abc", float("nan"), float("inf"), "-Infinity", -1, True, [1]])
+def test_invalid_prices_are_rejected(price):
+    item = server.build_import_item(entry(price=price), ARCHIVE_NAMES)
+
+    assert item["status"] == "failed"
+    assert item["error"] == "Invalid price"
+
+
+@pytest.fixture
+def archive(tmp_path):
+    def build(manifest=None, files=("lesson1.mp4",)):
+        path = tmp_path / "chapter.zip"
+        with zipfile.ZipFile(path, "w") as zip_file:
+            for name in files:
+                zip_file.writestr(name, b"data")
+            if manifest is not None:
+                zip_file.writestr(server.IMPORT_MANIFEST_NAME, manifest)
+        return str(path)
+    return build
+
+
+def test_manifest_is_read_from_the_archive(archive):
+    items = server.read_import_manifest(archive(json.dumps([entry(), entry(file="other.mp4")])), None)
+
+    assert [item["status"] for item in items] == ["pending", "failed"]
+
+
+def test_uploaded_manifest_takes_precedence(archive):
+    items = server.read_import_manifest(archive("not json"), json.dumps([entry()]).encode())
+
+    assert [item["status"] for item in items] == ["pending"]
+
+
+@pytest.mark.parametrize("manifest, error", [
+    (None, "Archive has no manifest.json"),
+    ("{not json", "Manifest is not valid JSON"),
+    ("[]", "Manifest must be a non-empty list of entries"),
+    ('{"file": "lesson1.mp4"}', "Manifest must be a non-empty list of entries"),
+])
+def test_invalid_manifest_fails_the_whole_job(archive, manifest, error):
+    with pytest.raises(ValueError, match=error):
+        server.read_import_manifest(archive(manifest), None)
+
+
+def test_invalid_archive_is_rejected(tmp_path):
+    path = tmp_path / "chapter.zip"
+    path.write_bytes(b"not a zip")
+
+    with pytest.raises(ValueError, match="not a valid zip file"):
+        server.read_import_manifest(str(path), None)
+
+
+class FailingImportJobs:
+    def __init__(self):
+        self.updates = []
+
+    async def find_one(self, query):
+        raise RuntimeError("database unavailable")
+
+    async def update_one(self, query, update):
+        self.updates.append(update)
+
+
+def test_unexpected_error_marks_job_failed_and_removes_archive(fake_db, tmp_path):
+    database = fake_db(import_jobs=FailingImportJobs())
+    archive_path = tmp_path / "upload.zip"
+    archive_path.write_bytes(b"zip")
+
+    asyncio.run(server.run_uploaded_content_import("job-1", str(archive_path), "admin@example.com"))
+
+    assert database.import_jobs.updates[-1]["$set"]["status"] == "failed"
+    assert "database unavailable" in database.import_jobs.updates[-1]["$set"]["error"]
+    assert not archive_path.exists()
+
+
+class RecordingImportJobs:
+    def __init__(self, items):
+        self.job = {"id": "job-1", "items": items}
+        self.updates = []
+
+    async def find_one(self, query):
+        return self.job
+
+    async def update_one(self, query, update):
+        self.updates.append(update)
+
+
+class PartiallyFailingContent:
+    def __init__(self, events):
+        self.events = events
+        self.documents = []
+
+    async def insert_many(self, documents):
+        # Ordered insert: the first document is saved before the second one fails
+        self.documents.append(documents[0])
+        raise RuntimeError("duplicate key")
+
+    async def delete_many(self, query):
+        self.events.append("delete content")
+        self.documents = [d for d in self.documents if d["import_job_id"] != query["import_job_id"]]
+
+
+class FakeBucket:
+    def __init__(self, events):
+        self.events = events
+
+    async def delete(self, file_id):
+        self.events.append(f"delete {file_id}")
+
+
+def test_failed_metadata_insert_removes_saved_content_before_its_files(fake_db, monkeypatch):
+    events = []
+    items = [
+        {"file": name, "status": "pending", "error": None, "metadata": {"title": name}}
+        for name in ("lesson1.mp4", "slides.pptx")
+    ]
+    database = fake_db(import_jobs=RecordingImportJobs(items), course_content=PartiallyFailingContent(events))
+    monkeypatch.setattr(server, "AsyncIOMotorGridFSBucket", lambda db: FakeBucket(events))
+
+    async def fake_stream_archive_entry(archive_path, name, bucket):
+        return f"file-{name}"
+
+    monkeypatch.setattr(server, "stream_archive_entry", fake_stream_archive_entry)
+
+    asyncio.run(server.import_archive_entries("job-1", "archive.zip", "admin@example.com"))
+
+    assert database.course_content.documents == []
+    assert events == ["delete content", "delete file-lesson1.mp4", "delete file-slides.pptx"]
+    failed = database.import_jobs.updates[-1]["$set"]
+    assert failed["status"] == "failed"
+    assert failed["items.0.status"] == failed["items.1.status"] == "failed"
+    assert "duplicate key" in failed["items.1.error"]
+
+
+class SavingContent:
+    def __init__(self):
+        self.documents = []
+
+    async def insert_many(self, documents):
+        self.documents.extend(documents)
+
+
+def test_imported_content_is_published_to_the_media_store(fake_db, monkeypatch):
+    items = [{"file": "lesson1.mp4", "status": "pending", "error": None, "metadata": {"title": "Lesson 1"}}]
+    database = fake_db(import_jobs=RecordingImportJobs(items), course_content=SavingContent())
+    published = []
+    monkeypatch.setattr(server, "MEDIA_BACKEND", "s3")
+    monkeypatch.setattr(server, "AsyncIOMotorGridFSBucket", lambda db: FakeBucket([]))
+
+    async def fake_stream_archive_entry(archive_path, name, bucket):
+        return f"file-{name}"
+
+    async def fake_publish(content):
+        published.append(content["file_id"])
+
+    monkeypatch.setattr(server, "stream_archive_entry", fake_stream_archive_entry)
+    monkeypatch.setattr(server, "publish_content_media", fake_publish)
+
+    asyncio.run(server.import_archive_entries("job-1", "archive.zip", "admin@example.com"))
+
+    assert published == ["file-lesson1.mp4"]
+    assert database.import_jobs.updates[-1]["$set"]["status"] == "completed"
@@ -0,0 +1,147 @@
+import asyncio
+import csv
+import io
+from datetime import datetime
+
+import pytest
+
+import server
+
+
+async def batches(*batch_list):
+    for batch in batch_list:
+        yield batch
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+USER_BATCHES = (
+    [{"id": "u1", "email": "a@example.com", "gdpr_consent": True, "purchased_courses": ["c1", "c2"],
+      "created_at": datetime(2024, 1, 2, 3, 4, 5)}],
+    # Fields missing from a whole batch must not change the output shape
+    [{"id": "u2", "email": None}]
+)
+
+
+def test_resolve_export_columns_defaults_to_all_columns():
+    assert server.resolve_export_columns("bookings", None) == list(server.EXPORT_COLUMNS["bookings"])
+
+
+def test_resolve_export_columns_keeps_selection_order():
+    assert server.resolve_export_columns("users", " email ,id") == ["email", "id"]
+
+
+@pytest.mark.parametrize("collection, columns", [
+    ("users", "password"),
+    ("users", " , "),
+    ("admin_config", None),
+])
+def test_resolve_export_columns_rejects_unknown_input(collection, columns):
+    with pytest.raises(ValueError):
+        server.resolve_export_columns(collection, columns)
+
+
+def test_export_csv_writes_header_then_one_chunk_per_batch():
+    columns = ["id", "email", "gdpr_consent", "purchased_courses", "created_at"]
+
+    chunks = asyncio.run(collect(server.export_csv(batches(*USER_BATCHES), columns)))
+
+    assert len(chunks) == 3
+    rows = list(csv.reader(io.StringIO("".join(chunks))))
+    assert rows == [
+        columns,
+        ["u1", "a@example.com", "True", "c1;c2", "2024-01-02T03:04:05"],
+        ["u2", "", "", "", ""]
+    ]
+
+
+def test_export_csv_of_empty_collection_is_only_the_header():
+    chunks = asyncio.run(collect(server.export_csv(batches(), ["id", "email"])))
+    assert "".join(chunks) == "id,email\r\n"
+
+
+def test_export_parquet_writes_one_row_group_per_batch():
+    pq = pytest.importorskip("pyarrow.parquet")
+    columns = server.resolve_export_columns("users", None)
+
+    data = b"".join(asyncio.run(collect(server.export_parquet(batches(*USER_BATCHES), "users", columns))))
+
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+    assert parquet_file.num_row_groups == 2
+    assert parquet_file.schema_arrow == server.parquet_schema("users", columns)
+    rows = parquet_file.read().to_pylist()
+    assert rows[0]["purchased_courses"] == ["c1", "c2"]
+    assert rows[0]["created_at"] == datetime(2024, 1, 2, 3, 4, 5)
+    assert rows[1] == {column: None for column in columns} | {"id": "u2"}
+
+
+def test_export_parquet_handles_numbers_and_missing_timestamps():
+    pq = pytest.importorskip("pyarrow.parquet")
+    columns = ["id", "amount", "completed_at"]
+    transactions = [{"id": "t1", "amount": 79.99, "completed_at": None}], [{"id": "t2"}]
+
+    data = b"".join(asyncio.run(collect(server.export_parquet(batches(*transactions), "payment_transactions", columns))))
+
+    assert pq.read_table(io.BytesIO(data)).to_pylist() == [
+        {"id": "t1", "amount": 79.99, "completed_at": None},
+        {"id": "t2", "amount": None, "completed_at": None}
+    ]
+
+
+def test_export_sink_keeps_counting_across_drains():
+    sink = server.ExportSink()
+    sink.write(b"abc")
+    assert sink.drain() == b"abc"
+    sink.write(b"de")
+    assert sink.tell() == 5
+    assert sink.drain() == b"de"
+
+
+class FakeExportCursor:
+    def __init__(self, batch_list):
+        self.batch_list = list(batch_list)
+        self.closed = False
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        return self.batch_list.pop(0) if self.batch_list else []
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeExportCollection:
+    def __init__(self, batch_list):
+        self.cursor = FakeExportCursor(batch_list)
+
+    def find(self, query, projection):
+        return self.cursor
+
+
+# CSV sends its header before the first batch
+@pytest.mark.parametrize("export_format,chunks", [("csv", 2), ("parquet", 1)])
+def test_client_disconnect_closes_the_cursor(fake_db, export_format, chunks):
+    database = fake_db(users=FakeExportCollection(USER_BATCHES))
+
+    async def read_first_batch_then_disconnect():
+        stream = server.export_stream("users", export_format, ["id", "email"], None, None)
+        for _ in range(chunks):
+            await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(read_first_batch_then_disconnect())
+
+    assert database.users.cursor.closed
+    assert database.users.cursor.batch_list == [USER_BATCHES[1]]
+
+
+def test_finished_export_closes_the_cursor(fake_db):
+    database = fake_db(users=FakeExportCollection(USER_BATCHES))
+
+    asyncio.run(collect(server.export_stream("users", "csv", ["id", "email"], None, None)))
+
+    assert database.users.cursor.closed
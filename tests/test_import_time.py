@@ -0,0 +1,41 @@
+import pytest
+
+import manage
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:        10 |         10 |       _weakref
+import time:       200 |        210 |     weakref
+import time:       300 |        510 |   copy
+import time:        40 |         40 |   re
+import time:        20 |        570 | json
+import time:         5 |          5 |   typing_extensions
+import time:       900 |        900 |   fastapi.routing
+import time:       100 |       1005 | server
+"""
+
+
+def test_parse_import_time_reports_direct_imports_of_the_module():
+    total_us, children, imported = manage.parse_import_time(IMPORTTIME_OUTPUT, "server")
+
+    assert total_us == 1005
+    # Nested and earlier top-level imports are not direct children of server
+    assert children == [(900, "fastapi.routing"), (5, "typing_extensions")]
+    assert {"_weakref", "weakref", "copy", "json", "server"} <= imported
+
+
+def test_parse_import_time_reads_nesting_depth_from_indentation():
+    _, children, _ = manage.parse_import_time(IMPORTTIME_OUTPUT, "json")
+
+    assert children == [(510, "copy"), (40, "re")]
+
+
+def test_parse_import_time_requires_the_module_entry():
+    with pytest.raises(RuntimeError):
+        manage.parse_import_time(IMPORTTIME_OUTPUT, "pandas")
+
+
+def test_server_startup_does_not_import_lazy_modules():
+    _, _, imported = manage.measure_import_time("server")
+
+    assert {name.split(".")[0] for name in imported} & manage.LAZY_MODULES == set()
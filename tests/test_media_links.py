@@ -0,0 +1,204 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import server
+
+CONTENT = {"_id": "object-id", "id": "c1", "filename": "lezione.mp4", "content_type": "video", "section": "premium"}
+
+
+def signed(claims):
+    return jwt.encode(claims, server.SECRET_KEY, algorithm=server.ALGORITHM)
+
+
+def media_claims(**overrides):
+    return {"typ": "media", "cid": "c1", "ver": 0, "usr": "a@example.com", "exp": int(time.time()) + 60, **overrides}
+
+
+def assert_rejected(token):
+    with pytest.raises(HTTPException) as error:
+        server.decode_media_token(token)
+    assert error.value.status_code == 403
+
+
+def test_issued_token_round_trips():
+    token, expires_at = server.create_media_token(CONTENT, "a@example.com")
+
+    payload = server.decode_media_token(token)
+    assert (payload["cid"], payload["ver"], payload["usr"]) == ("c1", 0, "a@example.com")
+    assert "sub" not in payload
+
+
+def test_access_token_is_not_a_media_link():
+    assert_rejected(server.create_access_token({"sub": "a@example.com"}))
+
+
+def test_media_link_is_not_an_access_token():
+    token, _ = server.create_media_token(CONTENT, "a@example.com")
+    credentials = server.HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_current_user(credentials))
+    assert error.value.status_code == 401
+
+
+def test_token_signed_with_another_key_is_rejected():
+    assert_rejected(jwt.encode(media_claims(), "another-secret", algorithm=server.ALGORITHM))
+
+
+def test_expired_token_is_accepted_within_clock_skew_leeway():
+    token = signed(media_claims(exp=int(time.time()) - server.MEDIA_CLOCK_SKEW_SECONDS // 2))
+    assert server.decode_media_token(token)["cid"] == "c1"
+
+
+def test_expired_token_is_rejected_beyond_leeway():
+    assert_rejected(signed(media_claims(exp=int(time.time()) - server.MEDIA_CLOCK_SKEW_SECONDS - 5)))
+
+
+@pytest.mark.parametrize("filename, key", [
+    ("lezione.mp4", "content/c1.mp4"),
+    ("Lezione Uno.MP4", "content/c1.mp4"),
+    ("../../../etc/passwd", "content/c1"),
+    ("slides.pptx/../../x", "content/c1"),
+    (None, "content/c1"),
+])
+def test_storage_key_comes_from_content_id(filename, key):
+    assert server.media_storage_key({"id": "c1", "filename": filename}) == key
+
+
+def test_storage_key_rejects_unexpected_content_ids():
+    with pytest.raises(ValueError):
+        server.media_storage_key({"id": "../c1", "filename": "a.mp4"})
+
+
+def test_media_file_path_stays_under_media_root(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "MEDIA_ROOT", str(tmp_path))
+
+    assert server.media_file_path("content/c1.mp4") == os.path.join(os.path.realpath(tmp_path), "content", "c1.mp4")
+    with pytest.raises(ValueError):
+        server.media_file_path("../outside.mp4")
+    with pytest.raises(ValueError):
+        server.media_file_path("/etc/passwd")
+
+
+class FakeContent:
+    def __init__(self, document):
+        self.document = document
+
+    async def find_one(self, query, projection=None):
+        if self.document and self.document["id"] == query["id"]:
+            return dict(self.document)
+        return None
+
+
+@pytest.fixture
+def nginx_media(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "MEDIA_BACKEND", "nginx")
+    return lambda document: fake_db(course_content=FakeContent(document))
+
+
+def test_published_media_is_handed_to_nginx(nginx_media):
+    nginx_media({**CONTENT, "storage_key": "content/c1.mp4"})
+    token, _ = server.create_media_token(CONTENT, "a@example.com")
+
+    response = asyncio.run(server.get_media(token))
+
+    assert response.headers["x-accel-redirect"] == server.NGINX_MEDIA_PREFIX + "content/c1.mp4"
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.body == b""
+
+
+def test_revoked_link_is_rejected(nginx_media):
+    nginx_media({**CONTENT, "storage_key": "content/c1.mp4", "media_version": 1})
+    token, _ = server.create_media_token(CONTENT, "a@example.com")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_media(token))
+    assert error.value.status_code == 403
+
+
+def test_link_to_deleted_content_is_rejected(nginx_media):
+    nginx_media(None)
+    token, _ = server.create_media_token(CONTENT, "a@example.com")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_media(token))
+    assert error.value.status_code == 403
+
+
+def test_malformed_storage_key_is_never_redirected(nginx_media):
+    nginx_media({**CONTENT, "storage_key": "content/c1/../../secret", "file_content": "ZGF0YQ=="})
+    token, _ = server.create_media_token(CONTENT, "a@example.com")
+
+    response = asyncio.run(server.get_media(token))
+
+    assert "x-accel-redirect" not in response.headers
+
+
+class RecordingContent:
+    def __init__(self):
+        self.documents = {}
+
+    async def insert_one(self, document):
+        self.documents[document["id"]] = document
+
+    async def update_one(self, query, update):
+        self.documents[query["id"]].update(update["$set"])
+
+
+class FakeAdmins:
+    async def find_one(self, query):
+        return {"email": query["email"], "is_admin": True}
+
+
+class FakeUpload:
+    filename = "lezione.mp4"
+
+    async def read(self):
+        return b"video bytes"
+
+
+def upload_lesson():
+    return asyncio.run(server.upload_content(
+        title="Lezione", description="Intro", content_type="video", section="premium",
+        chapter=None, price=None, file=FakeUpload(), current_user="admin@example.com"
+    ))
+
+
+def test_upload_publishes_to_the_media_store(fake_db, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "MEDIA_BACKEND", "nginx")
+    monkeypatch.setattr(server, "MEDIA_ROOT", str(tmp_path))
+    database = fake_db(users=FakeAdmins(), course_content=RecordingContent())
+
+    content_id = upload_lesson()["content_id"]
+
+    key = database.course_content.documents[content_id]["storage_key"]
+    assert key == f"content/{content_id}.mp4"
+    assert (tmp_path / key).read_bytes() == b"video bytes"
+
+
+def test_upload_without_media_store_is_streamed_by_the_api(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "MEDIA_BACKEND", "")
+    database = fake_db(users=FakeAdmins(), course_content=RecordingContent())
+
+    content_id = upload_lesson()["content_id"]
+
+    assert "storage_key" not in database.course_content.documents[content_id]
+
+
+def test_publish_failure_keeps_the_upload(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "MEDIA_BACKEND", "s3")
+    database = fake_db(users=FakeAdmins(), course_content=RecordingContent())
+
+    async def failing_publish(content):
+        raise RuntimeError("bucket unavailable")
+
+    monkeypatch.setattr(server, "publish_content_media", failing_publish)
+
+    content_id = upload_lesson()["content_id"]
+
+    assert "storage_key" not in database.course_content.documents[content_id]
@@ -0,0 +1,200 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+
+import server
+
+
+def matches(document, query):
+    for field, condition in query.items():
+        value = document.get(field)
+        if isinstance(condition, dict):
+            if "$nin" in condition and value in condition["$nin"]:
+                return False
+            if "$ne" in condition and condition["$ne"] in (value or []):
+                return False
+            if "$lt" in condition and not (value is not None and value < condition["$lt"]):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length=None):
+        return self.documents
+
+
+class FakeTransactions:
+    def __init__(self, transaction):
+        self.transaction = transaction
+
+    def apply(self, update):
+        self.transaction.update(update.get("$set", {}))
+        for field in update.get("$unset", {}):
+            self.transaction.pop(field, None)
+
+    async def find_one_and_update(self, query, update):
+        if not matches(self.transaction, query):
+            return None
+        previous = dict(self.transaction)
+        self.apply(update)
+        return previous
+
+    async def find_one(self, query):
+        return dict(self.transaction) if matches(self.transaction, query) else None
+
+    async def update_one(self, query, update):
+        if matches(self.transaction, query):
+            self.apply(update)
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(self.transaction)] if matches(self.transaction, query) else [])
+
+
+class FakeUsers:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def update_one(self, query, update):
+        if self.error:
+            raise self.error
+
+
+class FakeRollups:
+    def __init__(self, error=None):
+        self.error = error
+        self.documents = {}
+
+    def apply(self, query, update, upsert):
+        document = self.documents.get(query["_id"])
+        if document is not None and not matches(document, query):
+            return "duplicate" if upsert else None
+        if document is None:
+            if not upsert:
+                return None
+            document = self.documents[query["_id"]] = {"count": 0, "transitions": []}
+        document["count"] += update["$inc"]["count"]
+        document["transitions"].append(update["$push"]["transitions"])
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.error:
+            raise self.error
+        errors = [
+            {"index": index, "code": server.DUPLICATE_KEY_ERROR}
+            for index, operation in enumerate(operations)
+            if self.apply(operation._filter, operation._doc, operation._upsert) == "duplicate"
+        ]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    async def update_one(self, query, update):
+        self.apply(query, update, upsert=False)
+
+
+def pending_transaction(course_package="corso_completo"):
+    return {
+        "id": "t1",
+        "paypal_order_id": "ORDER1",
+        "course_package": course_package,
+        "amount": 79.99,
+        "status": "pending",
+        "rollup_status": "pending",
+        "created_at": datetime(2024, 5, 1, 10, 0)
+    }
+
+
+def day_counts(database, course_package="corso_completo"):
+    return {
+        status: database.sales_rollups.documents.get(f"day|2024-05-01|{course_package}|{status}", {"count": 0})["count"]
+        for status in ("pending", "completed", "failed")
+    }
+
+
+@pytest.fixture
+def payment_db(fake_db):
+    def install(users_error=None, rollups_error=None):
+        return fake_db(
+            payment_transactions=FakeTransactions(pending_transaction()),
+            users=FakeUsers(users_error),
+            sales_rollups=FakeRollups(rollups_error)
+        )
+    return install
+
+
+def test_capture_moves_transaction_from_pending_to_completed(payment_db):
+    database = payment_db()
+
+    result = asyncio.run(server.capture_paypal_order("ORDER1", current_user="a@example.com"))
+
+    assert result["status"] == "success"
+    assert day_counts(database) == {"pending": -1, "completed": 1, "failed": 0}
+
+
+def test_repeated_capture_is_counted_once(payment_db):
+    database = payment_db()
+
+    asyncio.run(server.capture_paypal_order("ORDER1", current_user="a@example.com"))
+    asyncio.run(server.capture_paypal_order("ORDER1", current_user="a@example.com"))
+
+    assert day_counts(database) == {"pending": -1, "completed": 1, "failed": 0}
+
+
+def test_failure_after_capture_keeps_payment_completed(payment_db):
+    database = payment_db(users_error=RuntimeError("users unavailable"))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.capture_paypal_order("ORDER1", current_user="a@example.com"))
+
+    assert error.value.status_code == 500
+    assert database.payment_transactions.transaction["status"] == "completed"
+    assert day_counts(database) == {"pending": -1, "completed": 1, "failed": 0}
+
+
+def test_rollup_failure_does_not_fail_the_capture(payment_db):
+    database = payment_db(rollups_error=RuntimeError("rollups unavailable"))
+
+    result = asyncio.run(server.capture_paypal_order("ORDER1", current_user="a@example.com"))
+
+    assert result["status"] == "success"
+    assert database.payment_transactions.transaction["status"] == "completed"
+    assert "rollup_pending_at" in database.payment_transactions.transaction
+
+
+def test_reconcile_finishes_a_failed_rollup_update(payment_db):
+    database = payment_db(rollups_error=RuntimeError("rollups unavailable"))
+    asyncio.run(server.capture_paypal_order("ORDER1", current_user="a@example.com"))
+    database.sales_rollups.error = None
+    database.payment_transactions.transaction["rollup_pending_at"] = datetime(2024, 5, 1, 10, 5)
+
+    assert asyncio.run(server.reconcile_sales_rollups()) == 1
+
+    assert day_counts(database) == {"pending": -1, "completed": 1, "failed": 0}
+    assert database.payment_transactions.transaction["rollup_status"] == "completed"
+    assert "rollup_pending_at" not in database.payment_transactions.transaction
+
+
+def test_reconcile_does_not_count_an_applied_transition_twice(payment_db):
+    database = payment_db()
+    transaction = database.payment_transactions.transaction
+    transaction.update(status="completed", rollup_pending_at=datetime(2024, 5, 1, 10, 5))
+    # The increment landed but the process died before recording it on the transaction
+    asyncio.run(server.record_sales_transition(transaction, "pending", "completed"))
+
+    asyncio.run(server.reconcile_sales_rollups())
+
+    assert day_counts(database) == {"pending": -1, "completed": 1, "failed": 0}
+    assert "rollup_pending_at" not in transaction
+
+
+def test_recent_pending_rollups_are_left_to_the_request(payment_db):
+    database = payment_db()
+    database.payment_transactions.transaction["rollup_pending_at"] = datetime.utcnow()
+
+    assert asyncio.run(server.reconcile_sales_rollups()) == 0